@@ -10,36 +10,36 @@ The generated SQL targets MySQL/MariaDB Typecho tables:
 from __future__ import annotations
 
 import argparse
+import codecs
+import functools
 import html
+import os
 import re
 import sqlite3
 import sys
-from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 from urllib.parse import unquote
 
 
 SITE_SUFFIX_RE = re.compile(r"\s+\|\s+[^|]+$")
 FRACTION_WITH_TZ_RE = re.compile(r"\.(\d+)([+-]\d{2}:\d{2})$")
 FRACTION_NO_TZ_RE = re.compile(r"\.(\d+)$")
+FETCH_BATCH_SIZE = 10000
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+SLUG_DROP_RE = re.compile(r"[^\w\s-]", re.UNICODE)
+SLUG_SPACE_RE = re.compile(r"[\s_]+", re.UNICODE)
+SLUG_DASH_RE = re.compile(r"-+")
+COMMENT_COLUMNS = (
+    "(`coid`,`cid`,`created`,`author`,`authorId`,`ownerId`,"
+    "`mail`,`url`,`ip`,`agent`,`text`,`type`,`status`,`parent`)"
+)
 
 
-@dataclass
-class ArtalkComment:
-    comment_id: int
-    created: int
-    page_key: str
-    content: str
-    author: str
-    mail: str
-    url: str
-    ip: str
-    agent: str
-    rid: int
-    is_pending: bool
-    title_candidates: list[str]
+# (comment_id, created, page_key, content, author, mail, url, ip, agent, rid,
+#  is_pending, title_candidates) -- plain tuples keep the per-row cost low.
+CommentRow = tuple[int, int, str, str, str, str, str, str, str, int, bool, tuple[str, ...]]
 
 
 def parse_args() -> argparse.Namespace:
@@ -80,6 +80,8 @@ def normalize_prefix(prefix: str) -> str:
 def sql_quote(value: str | None) -> str:
     if value is None:
         return "NULL"
+    if not value:
+        return "''"
     escaped = (
         value.replace("\\", "\\\\")
         .replace("\0", "\\0")
@@ -92,16 +94,16 @@ def sql_quote(value: str | None) -> str:
     return f"'{escaped}'"
 
 
+# Author, mail, url, ip and agent repeat across comments, so their quoted
+# form is cached; comment bodies are effectively unique and are not.
+@functools.lru_cache(maxsize=8192)
+def sql_quote_field(value: str) -> str:
+    return sql_quote(value)
+
+
 def dedupe(items: Iterable[str]) -> list[str]:
-    out: list[str] = []
-    seen: set[str] = set()
-    for item in items:
-        v = item.strip()
-        if not v or v in seen:
-            continue
-        seen.add(v)
-        out.append(v)
-    return out
+    # dict keeps insertion order, so this drops repeats while preserving order.
+    return list(dict.fromkeys(v for v in (item.strip() for item in items) if v))
 
 
 def parse_artalk_time(raw: str | None) -> int:
@@ -112,6 +114,19 @@ def parse_artalk_time(raw: str | None) -> int:
     if not text:
         return 0
 
+    # Fast path for the usual "YYYY-MM-DD HH:MM:SS" shape, optionally with "T"/"Z".
+    core = text[:-1] if text.endswith("Z") else text
+    if (
+        len(core) == 19
+        and core[4] == core[7] == "-"
+        and core[10] in " T"
+        and core[13] == core[16] == ":"
+    ):
+        try:
+            return int(datetime.fromisoformat(core + "+00:00").timestamp())
+        except ValueError:
+            pass
+
     # Normalize separator and UTC marker for datetime.fromisoformat.
     if " " in text and "T" not in text:
         text = text.replace(" ", "T", 1)
@@ -158,6 +173,11 @@ def cleaned_page_title(page_title: str | None) -> str:
     text = html.unescape(page_title).strip()
     if not text:
         return ""
+    # Common case: a literal " | Site Name" suffix. The regex remains for
+    # other whitespace around the pipe.
+    idx = text.rfind(" | ")
+    if idx != -1 and "|" not in text[idx + 3 :]:
+        return text[:idx].strip()
     text = SITE_SUFFIX_RE.sub("", text).strip()
     return text
 
@@ -171,11 +191,12 @@ def title_from_page_key(page_key: str | None) -> str:
     return unquote(segments[-1]).strip()
 
 
+@functools.lru_cache(maxsize=4096)
 def slugify(text: str) -> str:
     value = text.strip().lower()
-    value = re.sub(r"[^\w\s-]", "", value, flags=re.UNICODE)
-    value = re.sub(r"[\s_]+", "-", value, flags=re.UNICODE)
-    value = re.sub(r"-+", "-", value).strip("-")
+    value = SLUG_DROP_RE.sub("", value)
+    value = SLUG_SPACE_RE.sub("-", value)
+    value = SLUG_DASH_RE.sub("-", value).strip("-")
     return value
 
 
@@ -187,14 +208,22 @@ def build_title_candidates(page_title: str | None, page_key: str | None) -> list
     return dedupe(candidates)
 
 
-def fetch_comments(db_path: Path) -> list[ArtalkComment]:
+def iter_comments(db_path: Path) -> Iterator[CommentRow]:
     if not db_path.exists():
         raise FileNotFoundError(f"Artalk DB not found: {db_path}")
 
+    # Run the query eagerly so schema errors surface here instead of mid-write;
+    # rows are then streamed and the connection closes with the iterator.
     conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
     try:
-        rows = conn.execute(
+        # Read-only tuning: 64 MiB page cache, in-memory temp b-trees for the
+        # GROUP BY/ORDER BY, and mmap'd reads. One read transaction spans all
+        # fetchmany batches so the dump is read from a single snapshot.
+        conn.execute("PRAGMA cache_size = -65536")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        conn.execute("BEGIN")
+        cursor = conn.execute(
             """
             SELECT
                 c.id AS comment_id,
@@ -208,60 +237,91 @@ def fetch_comments(db_path: Path) -> list[ArtalkComment]:
                 u.name AS user_name,
                 u.email AS user_email,
                 u.link AS user_link,
-                (
-                    SELECT p.title
-                    FROM pages p
-                    WHERE p.key = c.page_key
-                      AND p.deleted_at IS NULL
-                    ORDER BY p.id DESC
-                    LIMIT 1
-                ) AS page_title
+                p.title AS page_title
             FROM comments c
             LEFT JOIN users u
                 ON u.id = c.user_id
                AND u.deleted_at IS NULL
+            LEFT JOIN (
+                -- SQLite takes bare columns from the MAX(id) row: latest page per key.
+                SELECT key, title, MAX(id) AS latest_id
+                FROM pages
+                WHERE deleted_at IS NULL
+                GROUP BY key
+            ) p
+                ON p.key = c.page_key
             WHERE c.deleted_at IS NULL
             ORDER BY c.id ASC
             """
-        ).fetchall()
-    finally:
+        )
+    except Exception:
         conn.close()
+        raise
+    cursor.arraysize = FETCH_BATCH_SIZE
+    return comments_from_cursor(conn, cursor)
 
-    comments: list[ArtalkComment] = []
-    for row in rows:
-        comment_id = int(row["comment_id"])
-        rid = int(row["rid"] or 0)
-        title_candidates = build_title_candidates(row["page_title"], row["page_key"])
-        comments.append(
-            ArtalkComment(
-                comment_id=comment_id,
-                created=parse_artalk_time(row["created_at"]),
-                page_key=str(row["page_key"] or ""),
-                content=str(row["content"] or ""),
-                author=str(row["user_name"] or "").strip() or "Anonymous",
-                mail=str(row["user_email"] or "").strip(),
-                url=str(row["user_link"] or "").strip(),
-                ip=str(row["ip"] or "").strip(),
-                agent=str(row["ua"] or "").strip(),
-                rid=rid if rid > 0 else 0,
-                is_pending=bool(row["is_pending"]),
-                title_candidates=title_candidates,
-            )
-        )
-    return comments
 
+def comments_from_cursor(
+    conn: sqlite3.Connection, cursor: sqlite3.Cursor
+) -> Iterator[CommentRow]:
+    # Comments on the same page share their title candidates; compute once.
+    title_cache: dict[tuple[str | None, str | None], tuple[str, ...]] = {}
+    try:
+        while True:
+            batch = cursor.fetchmany()
+            if not batch:
+                break
+            for (
+                comment_id,
+                created_at,
+                page_key,
+                content,
+                rid,
+                is_pending,
+                ip,
+                ua,
+                user_name,
+                user_email,
+                user_link,
+                page_title,
+            ) in batch:
+                rid = int(rid or 0)
+                cache_key = (page_key, page_title)
+                title_candidates = title_cache.get(cache_key)
+                if title_candidates is None:
+                    title_candidates = tuple(build_title_candidates(page_title, page_key))
+                    title_cache[cache_key] = title_candidates
+                yield (
+                    int(comment_id),
+                    parse_artalk_time(created_at),
+                    str(page_key or ""),
+                    str(content or ""),
+                    str(user_name or "").strip() or "Anonymous",
+                    str(user_email or "").strip(),
+                    str(user_link or "").strip(),
+                    str(ip or "").strip(),
+                    str(ua or "").strip(),
+                    rid if rid > 0 else 0,
+                    bool(is_pending),
+                    title_candidates,
+                )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
 
-def build_match_where(comment: ArtalkComment) -> tuple[str, str]:
-    if not comment.title_candidates:
-        return "", ""
+
+def build_match_sql(title_candidates: tuple[str, ...], prefix: str) -> str:
+    if not title_candidates:
+        return ""
 
     clauses: list[str] = []
     order_cases: list[str] = []
     slug_seen: set[str] = set()
 
-    for idx, title in enumerate(comment.title_candidates, start=1):
-        clauses.append(f"tc.`title` = {sql_quote(title)}")
-        order_cases.append(f"WHEN tc.`title` = {sql_quote(title)} THEN {idx}")
+    for idx, title in enumerate(title_candidates, start=1):
+        quoted_title = sql_quote(title)
+        clauses.append(f"tc.`title` = {quoted_title}")
+        order_cases.append(f"WHEN tc.`title` = {quoted_title} THEN {idx}")
 
         slug = slugify(title)
         if slug and slug not in slug_seen:
@@ -270,89 +330,124 @@ def build_match_where(comment: ArtalkComment) -> tuple[str, str]:
 
     where_sql = " OR ".join(clauses)
     order_sql = "CASE " + " ".join(order_cases) + " ELSE 999 END, tc.`cid` ASC"
-    return where_sql, order_sql
-
-
-def build_insert_sql(comment: ArtalkComment, prefix: str) -> str:
-    where_sql, order_sql = build_match_where(comment)
-    if not where_sql:
-        return f"-- Skipped Artalk #{comment.comment_id}: no page title candidates."
-
-    status = "waiting" if comment.is_pending else "approved"
-    parent_expr = "0" if comment.rid <= 0 else f"@coid_offset + {comment.rid}"
-
     return (
-        f"INSERT INTO `{prefix}comments` "
-        "(`coid`,`cid`,`created`,`author`,`authorId`,`ownerId`,`mail`,`url`,`ip`,`agent`,`text`,`type`,`status`,`parent`) "
-        "SELECT "
-        f"@coid_offset + {comment.comment_id},"
-        "tc.`cid`,"
-        f"{comment.created},"
-        f"{sql_quote(comment.author)},"
-        "0,"
-        "COALESCE(tc.`authorId`,1),"
-        f"{sql_quote(comment.mail)},"
-        f"{sql_quote(comment.url)},"
-        f"{sql_quote(comment.ip)},"
-        f"{sql_quote(comment.agent)},"
-        f"{sql_quote(comment.content)},"
-        "'comment',"
-        f"{sql_quote(status)},"
-        f"{parent_expr} "
-        f"FROM `{prefix}contents` tc "
-        "WHERE tc.`type` IN ('post','page') "
-        f"AND ({where_sql}) "
-        f"ORDER BY {order_sql} LIMIT 1;"
+        f" FROM `{prefix}contents` tc WHERE tc.`type` IN ('post','page') "
+        f"AND ({where_sql}) ORDER BY {order_sql} LIMIT 1;"
     )
 
 
-def build_sql(comments: list[ArtalkComment], prefix: str) -> str:
-    lines: list[str] = [
-        "-- Generated by artalk2typecho_comments.py",
-        "-- Import target: Typecho comments (MySQL/MariaDB)",
-        "SET NAMES utf8mb4;",
-        "START TRANSACTION;",
-        f"SET @coid_offset := (SELECT COALESCE(MAX(`coid`), 0) FROM `{prefix}comments`);",
-        "",
-        "-- Comment inserts",
-    ]
-
-    skipped = 0
-    for comment in comments:
-        titles = " | ".join(comment.title_candidates) if comment.title_candidates else "(none)"
-        lines.append(
-            f"-- Artalk #{comment.comment_id} page={comment.page_key} candidates={titles}"
+def build_insert_sql(row: CommentRow, insert_head: str, match_sql: str) -> str:
+    (
+        comment_id,
+        created,
+        _page_key,
+        content,
+        author,
+        mail,
+        url,
+        ip,
+        agent,
+        rid,
+        is_pending,
+        _title_candidates,
+    ) = row
+    if not match_sql:
+        return f"-- Skipped Artalk #{comment_id}: no page title candidates."
+
+    status = "'waiting'" if is_pending else "'approved'"
+    parent_expr = "0" if rid <= 0 else f"@coid_offset + {rid}"
+
+    return "".join(
+        (
+            insert_head,
+            str(comment_id),
+            ",tc.`cid`,",
+            str(created),
+            ",",
+            sql_quote_field(author),
+            ",0,COALESCE(tc.`authorId`,1),",
+            sql_quote_field(mail),
+            ",",
+            sql_quote_field(url),
+            ",",
+            sql_quote_field(ip),
+            ",",
+            sql_quote_field(agent),
+            ",",
+            sql_quote(content),
+            ",'comment',",
+            status,
+            ",",
+            parent_expr,
+            match_sql,
         )
-        stmt = build_insert_sql(comment, prefix)
-        if stmt.startswith("-- Skipped"):
-            skipped += 1
-        lines.append(stmt)
-
-    lines.extend(
-        [
-            "",
-            "-- Refresh article comment counters",
-            f"UPDATE `{prefix}contents` tc",
-            "SET tc.`commentsNum` = (",
-            f"    SELECT COUNT(1) FROM `{prefix}comments` cm",
-            "    WHERE cm.`cid` = tc.`cid`",
-            "      AND cm.`status` = 'approved'",
-            ");",
-            "",
-            "-- Reset AUTO_INCREMENT of comments table",
-            f"SET @next_comments_ai := (SELECT COALESCE(MAX(`coid`), 0) + 1 FROM `{prefix}comments`);",
-            f"SET @set_comments_ai_sql := CONCAT('ALTER TABLE `{prefix}comments` AUTO_INCREMENT = ', @next_comments_ai);",
-            "PREPARE stmt_set_comments_ai FROM @set_comments_ai_sql;",
-            "EXECUTE stmt_set_comments_ai;",
-            "DEALLOCATE PREPARE stmt_set_comments_ai;",
-            "",
-            "COMMIT;",
-            "",
-            f"-- Total comments from Artalk: {len(comments)}",
-            f"-- Comments missing title candidates: {skipped}",
-        ]
     )
-    return "\n".join(lines)
+
+
+def iter_sql_lines(
+    comments: Iterable[CommentRow], prefix: str, stats: dict[str, int]
+) -> Iterator[str]:
+    yield "-- Generated by artalk2typecho_comments.py"
+    yield "-- Import target: Typecho comments (MySQL/MariaDB)"
+    yield "SET NAMES utf8mb4;"
+    yield "START TRANSACTION;"
+    yield f"SET @coid_offset := (SELECT COALESCE(MAX(`coid`), 0) FROM `{prefix}comments`);"
+    yield ""
+    yield "-- Comment inserts"
+
+    total = 0
+    pending = 0
+    with_candidates = 0
+    unique_pages: set[str] = set()
+    # The FROM/WHERE/ORDER tail depends only on the title candidates, which every
+    # comment on the same page shares.
+    match_cache: dict[tuple[str, ...], str] = {}
+    insert_head = f"INSERT INTO `{prefix}comments` {COMMENT_COLUMNS} SELECT @coid_offset + "
+    for row in comments:
+        comment_id, page_key, is_pending, title_candidates = row[0], row[2], row[10], row[11]
+        total += 1
+        unique_pages.add(page_key)
+        if title_candidates:
+            with_candidates += 1
+        if is_pending:
+            pending += 1
+        titles = " | ".join(title_candidates) if title_candidates else "(none)"
+        yield f"-- Artalk #{comment_id} page={page_key} candidates={titles}"
+        match_sql = match_cache.get(title_candidates)
+        if match_sql is None:
+            match_sql = match_cache[title_candidates] = build_match_sql(
+                title_candidates, prefix
+            )
+        yield build_insert_sql(row, insert_head, match_sql)
+
+    # build_insert_sql skips exactly the comments without title candidates.
+    stats["total"] = total
+    stats["skipped"] = total - with_candidates
+    stats["pending"] = pending
+    stats["with_candidates"] = with_candidates
+    stats["unique_pages"] = len(unique_pages)
+
+    yield ""
+    yield "-- Refresh article comment counters"
+    yield f"UPDATE `{prefix}contents` tc"
+    yield "SET tc.`commentsNum` = ("
+    yield f"    SELECT COUNT(1) FROM `{prefix}comments` cm"
+    yield "    WHERE cm.`cid` = tc.`cid`"
+    yield "      AND cm.`status` = 'approved'"
+    yield ");"
+    yield ""
+    yield "-- Reset AUTO_INCREMENT of comments table"
+    yield f"SET @next_comments_ai := (SELECT COALESCE(MAX(`coid`), 0) + 1 FROM `{prefix}comments`);"
+    yield f"SET @set_comments_ai_sql := CONCAT('ALTER TABLE `{prefix}comments` AUTO_INCREMENT = ', @next_comments_ai);"
+    yield "PREPARE stmt_set_comments_ai FROM @set_comments_ai_sql;"
+    yield "EXECUTE stmt_set_comments_ai;"
+    yield "DEALLOCATE PREPARE stmt_set_comments_ai;"
+    yield ""
+    yield "COMMIT;"
+    yield ""
+    # Summary counters are only final once the comment loop is exhausted.
+    yield f"-- Total comments from Artalk: {stats['total']}"
+    yield f"-- Comments missing title candidates: {stats['skipped']}"
 
 
 def main() -> int:
@@ -363,22 +458,32 @@ def main() -> int:
     prefix = normalize_prefix(args.table_prefix)
 
     try:
-        comments = fetch_comments(db_path)
+        comments = iter_comments(db_path)
     except Exception as exc:
         print(f"Failed to read Artalk DB: {exc}", file=sys.stderr)
         return 1
 
-    sql = build_sql(comments, prefix)
-    output_path.write_text(sql, encoding=args.encoding, newline="\n")
-
-    unique_pages = len({comment.page_key for comment in comments})
-    with_candidates = sum(1 for comment in comments if comment.title_candidates)
-    pending_count = sum(1 for comment in comments if comment.is_pending)
+    stats: dict[str, int] = {}
+    # Rows are converted while the file is written, so a bad row can fail
+    # mid-stream; write next to the output and only replace it on success.
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    try:
+        encode = codecs.getincrementalencoder(args.encoding)().encode
+        with tmp_path.open("wb", buffering=OUTPUT_BUFFER_SIZE) as f:
+            for line in iter_sql_lines(comments, prefix, stats):
+                f.write(encode(f"{line}\n"))
+        os.replace(tmp_path, output_path)
+    except Exception as exc:
+        print(f"Failed to read Artalk DB: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
-    print(f"Converted comments: {len(comments)}")
-    print(f"Unique commented pages: {unique_pages}")
-    print(f"Comments with title candidates: {with_candidates}/{len(comments)}")
-    print(f"Pending comments: {pending_count}")
+    total = stats["total"]
+    print(f"Converted comments: {total}")
+    print(f"Unique commented pages: {stats['unique_pages']}")
+    print(f"Comments with title candidates: {stats['with_candidates']}/{total}")
+    print(f"Pending comments: {stats['pending']}")
     print(f"Output SQL: {output_path}")
     return 0
 
@@ -14,12 +14,19 @@ Usage example:
 from __future__ import annotations
 
 import argparse
+import codecs
+import functools
+import hashlib
+import os
+import pickle
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Iterator
 from urllib.parse import quote
 
 try:
@@ -32,22 +39,73 @@ FRONT_MATTER_BOUNDARY = "---"
 KEY_VALUE_RE = re.compile(r"^([A-Za-z0-9_-]+):(?:\s*(.*))?$")
 LIST_ITEM_RE = re.compile(r"^\s*-\s*(.+?)\s*$")
 DATE_OFFSET_RE = re.compile(r"([+-]\d{2})(\d{2})$")
+DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d",
+)
+MARKDOWN_SUFFIXES = frozenset({".md", ".markdown"})
 TIMESTAMP_SUFFIX_RE = re.compile(r"_[0-9]{8}_[0-9]{6}$")
-
-MARKDOWN_IMAGE_RE = re.compile(r"(!\[[^\]]*]\()([^\)\n]+)(\))")
-HTML_IMG_SRC_RE = re.compile(
-    r"(<img\b[^>]*?\bsrc\s*=\s*)([\"'])(.+?)(\2)", flags=re.IGNORECASE
+INT_RE = re.compile(r"-?\d+")
+FLOAT_RE = re.compile(r"-?\d+\.\d+")
+URL_SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+ABSOLUTE_URL_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*://")
+
+SLUG_DROP_RE = re.compile(r"[^\w\s-]", re.UNICODE)
+SLUG_SPACE_RE = re.compile(r"[\s_]+", re.UNICODE)
+SLUG_DASH_RE = re.compile(r"-+", re.UNICODE)
+ASSET_KEY_SEPARATOR_RE = re.compile(r"[\s_-]+")
+ASSET_KEY_DROP_RE = re.compile(r"[^\w\u4e00-\u9fff]+", re.UNICODE)
+
+IMAGE_LINK_RE = re.compile(
+    r"(?P<md_head>!\[[^\]]*]\()(?P<md_target>[^\)\n]+)\)"
+    r"|(?P<html_head><img\b[^>]*?\bsrc\s*=\s*)(?P<quote>[\"'])(?P<src>.+?)(?P=quote)",
+    flags=re.IGNORECASE,
 )
 
-DISPLAY_DOLLAR_RE = re.compile(r"(?s)(?<!\\)\$\$(.+?)(?<!\\)\$\$")
-BRACKET_MATH_RE = re.compile(r"(?s)\\\[(.+?)\\\]")
-PAREN_MATH_RE = re.compile(r"(?s)\\\((.+?)\\\)")
+MATH_BLOCK_RE = re.compile(
+    r"(?s)(?<!\\)\$\$(?P<dd>.+?)(?<!\\)\$\$"
+    r"|\\\[(?P<br>.+?)\\\]"
+    r"|\\\((?P<pr>.+?)\\\)"
+)
+MATH_BLOCK_DELIMITERS = {
+    "dd": ("$$", "$$"),
+    "br": (r"\[", r"\]"),
+    "pr": (r"\(", r"\)"),
+}
 INLINE_DOLLAR_RE = re.compile(r"(?<!\\)\$(?!\$)(.+?)(?<!\\)\$")
 
+FENCE_OPEN_RE = re.compile(r"^[ \t]*(`{3,}|~{3,})")
+# An opening run must be maximal; the span closes at the next equal run.
+INLINE_CODE_RE = re.compile(r"(`+)(?!`).*?\1", re.DOTALL)
+# An underscore is escaped when an odd run of backslashes precedes it; these
+# match only the live cases (an even, possibly empty, run of backslash pairs).
+MATH_UNDERSCORE_RE = re.compile(r"(?<!\\)((?:\\\\)*)_")
+MATH_ESCAPED_UNDERSCORE_RE = re.compile(r"(?<!\\)((?:\\\\)*)\\_")
+
 TOKEN_PREFIX = "@@HEXO2TYPECHO_TOKEN_"
+TOKEN_RE = re.compile(re.escape(TOKEN_PREFIX) + r"\d+@@")
+
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+# Bump when read_post output changes so stale --cache entries are ignored.
+CACHE_VERSION = 1
+# Multi-row INSERTs are also split by size so a batch of long posts stays
+# well below MySQL's max_allowed_packet (4 MiB by default on older servers).
+MAX_INSERT_CHARS = 1_000_000
+
+VALID_STATUSES = frozenset({"publish", "draft", "private", "hidden", "waiting"})
+CONTENT_COLUMNS = (
+    "(`cid`,`title`,`slug`,`created`,`modified`,`text`,`order`,`authorId`,"
+    "`template`,`type`,`status`,`password`,`commentsNum`,`allowComment`,"
+    "`allowPing`,`allowFeed`,`parent`)"
+)
+META_COLUMNS = "(`mid`,`name`,`slug`,`type`,`description`,`count`,`order`,`parent`)"
 
 
-@dataclass
+@dataclass(slots=True)
 class HexoPost:
     source_path: Path
     title: str
@@ -65,7 +123,7 @@ class HexoPost:
     rewritten_image_links: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Term:
     mid: int
     name: str
@@ -74,6 +132,13 @@ class Term:
     count: int = 0
 
 
+@dataclass(slots=True)
+class AssetDirIndex:
+    names: set[str]
+    by_prefix: dict[str, list[str]]  # "<stem>" -> dirs named "<stem>_..."
+    by_key: dict[str, list[str]]  # normalize_asset_match_key(dir) -> dirs
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Convert Hexo posts to Typecho SQL import statements."
@@ -150,26 +215,46 @@ def parse_args() -> argparse.Namespace:
         default="utf-8",
         help="Output SQL encoding (default: utf-8).",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for parsing posts (default: CPU count; 1 disables).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Rows per multi-row INSERT statement (default: 500).",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="Reuse parsed posts from this file when sources are unchanged (default: off).",
+    )
     return parser.parse_args()
 
 
 def split_front_matter(text: str) -> tuple[dict[str, Any], str]:
     normalized = text.replace("\r\n", "\n").replace("\r", "\n")
-    lines = normalized.split("\n")
-    if not lines or lines[0].strip() != FRONT_MATTER_BOUNDARY:
+    front_start = normalized.find("\n") + 1
+    if not front_start or normalized[: front_start - 1].strip() != FRONT_MATTER_BOUNDARY:
         return {}, normalized
 
-    end_index = -1
-    for idx in range(1, len(lines)):
-        if lines[idx].strip() == FRONT_MATTER_BOUNDARY:
-            end_index = idx
+    # Walk line offsets until the closing boundary so the body can be sliced
+    # out once instead of being split into lines and joined back together.
+    pos = front_start
+    while True:
+        line_end = normalized.find("\n", pos)
+        line = normalized[pos:] if line_end == -1 else normalized[pos:line_end]
+        if line.strip() == FRONT_MATTER_BOUNDARY:
             break
+        if line_end == -1:
+            return {}, normalized
+        pos = line_end + 1
 
-    if end_index == -1:
-        return {}, normalized
-
-    front_text = "\n".join(lines[1:end_index])
-    content = "\n".join(lines[end_index + 1 :]).lstrip("\n")
+    front_text = normalized[front_start : max(pos - 1, front_start)]
+    content = "" if line_end == -1 else normalized[line_end + 1 :].lstrip("\n")
     front = parse_front_matter(front_text)
     if not isinstance(front, dict):
         return {}, content
@@ -249,12 +334,12 @@ def parse_scalar(value: str) -> Any:
         return False
     if lowered in {"null", "none", "~"}:
         return None
-    if re.fullmatch(r"-?\d+", text):
+    if INT_RE.fullmatch(text):
         try:
             return int(text)
         except ValueError:
             return text
-    if re.fullmatch(r"-?\d+\.\d+", text):
+    if FLOAT_RE.fullmatch(text):
         try:
             return float(text)
         except ValueError:
@@ -264,38 +349,36 @@ def parse_scalar(value: str) -> Any:
 
 def normalize_list(value: Any) -> list[str]:
     flattened: list[str] = []
+    stack = [value]
 
-    if value is None:
-        return flattened
+    while stack:
+        item = stack.pop()
+        if item is None:
+            continue
+
+        if isinstance(item, str):
+            stripped = item.strip()
+            if stripped.startswith("[") and stripped.endswith("]"):
+                flattened.extend(
+                    part.strip().strip("'\"") for part in stripped[1:-1].split(",")
+                )
+            else:
+                flattened.append(stripped)
+            continue
+
+        if isinstance(item, dict):
+            if "name" in item:
+                stack.append(item["name"])
+            else:
+                stack.extend(reversed(list(item.values())))
+            continue
+
+        if isinstance(item, (list, tuple, set)):
+            stack.extend(reversed(list(item)))
+            continue
+
+        flattened.append(str(item))
 
-    if isinstance(value, str):
-        stripped = value.strip()
-        if not stripped:
-            return flattened
-        if stripped.startswith("[") and stripped.endswith("]"):
-            inner = stripped[1:-1].strip()
-            if not inner:
-                return flattened
-            parts = [x.strip() for x in inner.split(",") if x.strip()]
-            for part in parts:
-                flattened.append(part.strip("'\""))
-            return dedupe(flattened)
-        flattened.append(stripped)
-        return dedupe(flattened)
-
-    if isinstance(value, dict):
-        if "name" in value:
-            return normalize_list(value["name"])
-        for item in value.values():
-            flattened.extend(normalize_list(item))
-        return dedupe(flattened)
-
-    if isinstance(value, (list, tuple, set)):
-        for item in value:
-            flattened.extend(normalize_list(item))
-        return dedupe(flattened)
-
-    flattened.append(str(value))
     return dedupe(flattened)
 
 
@@ -313,7 +396,7 @@ def dedupe(items: Iterable[str]) -> list[str]:
 
 def normalize_status(meta: dict[str, Any]) -> str:
     status = str(meta.get("status", "")).strip().lower()
-    if status in {"publish", "draft", "private", "hidden", "waiting"}:
+    if status in VALID_STATUSES:
         return status
 
     draft = meta.get("draft")
@@ -344,15 +427,7 @@ def parse_date(value: Any, fallback: datetime | None = None) -> datetime:
                 except ValueError:
                     pass
 
-            known_formats = (
-                "%Y-%m-%d %H:%M:%S",
-                "%Y-%m-%d %H:%M",
-                "%Y-%m-%d",
-                "%Y/%m/%d %H:%M:%S",
-                "%Y/%m/%d %H:%M",
-                "%Y/%m/%d",
-            )
-            for fmt in known_formats:
+            for fmt in DATE_FORMATS:
                 try:
                     return datetime.strptime(text, fmt)
                 except ValueError:
@@ -377,9 +452,9 @@ def to_unix_timestamp(date_value: datetime) -> int:
 
 def slugify(text: str) -> str:
     value = text.strip().lower()
-    value = re.sub(r"[^\w\s-]", "", value, flags=re.UNICODE)
-    value = re.sub(r"[\s_]+", "-", value, flags=re.UNICODE)
-    value = re.sub(r"-+", "-", value, flags=re.UNICODE).strip("-")
+    value = SLUG_DROP_RE.sub("", value)
+    value = SLUG_SPACE_RE.sub("-", value)
+    value = SLUG_DASH_RE.sub("-", value).strip("-")
     return value or "item"
 
 def default_post_stem(path: Path, source_dir: Path) -> str:
@@ -392,33 +467,41 @@ def strip_asset_suffix(name: str) -> str:
     return TIMESTAMP_SUFFIX_RE.sub("", name)
 
 
+@functools.lru_cache(maxsize=4096)
 def normalize_asset_match_key(name: str) -> str:
     base = strip_asset_suffix(name).lower()
-    base = re.sub(r"[\s_-]+", "", base)
-    base = re.sub(r"[^\w\u4e00-\u9fff]+", "", base, flags=re.UNICODE)
+    base = ASSET_KEY_SEPARATOR_RE.sub("", base)
+    base = ASSET_KEY_DROP_RE.sub("", base)
     return base
 
 
+def build_asset_dir_index(asset_dir_names: set[str]) -> AssetDirIndex:
+    by_prefix: dict[str, list[str]] = {}
+    by_key: dict[str, list[str]] = {}
+    for name in sorted(asset_dir_names):
+        idx = name.find("_")
+        while idx != -1:
+            by_prefix.setdefault(name[:idx], []).append(name)
+            idx = name.find("_", idx + 1)
+        by_key.setdefault(normalize_asset_match_key(name), []).append(name)
+    return AssetDirIndex(names=asset_dir_names, by_prefix=by_prefix, by_key=by_key)
+
+
 def resolve_asset_dir_name(
-    markdown_path: Path, source_dir: Path, asset_dir_names: set[str]
+    markdown_path: Path, source_dir: Path, asset_index: AssetDirIndex
 ) -> str | None:
     if markdown_path.parent != source_dir:
         return markdown_path.parent.name
 
     stem = markdown_path.stem
-    if stem in asset_dir_names:
+    if stem in asset_index.names:
         return stem
 
-    prefix_matches = sorted(
-        [name for name in asset_dir_names if name.startswith(f"{stem}_")]
-    )
+    prefix_matches = asset_index.by_prefix.get(stem, [])
     if len(prefix_matches) == 1:
         return prefix_matches[0]
 
-    normalized_stem = normalize_asset_match_key(stem)
-    normalized_matches = sorted(
-        [name for name in asset_dir_names if normalize_asset_match_key(name) == normalized_stem]
-    )
+    normalized_matches = asset_index.by_key.get(normalize_asset_match_key(stem), [])
     if len(normalized_matches) == 1:
         return normalized_matches[0]
 
@@ -444,22 +527,18 @@ def is_relative_url(url: str) -> bool:
     target = url.strip()
     if not target:
         return False
-    lower = target.lower()
-
-    if target.startswith(("/", "#", "//")):
-        return False
-    if lower.startswith(("mailto:", "data:", "javascript:", "tel:")):
+    # "//" is covered by "/", and the scheme pattern (mailto:, data:, ...)
+    # is already case-insensitive through its character classes.
+    if target.startswith(("/", "#")):
         return False
-    if re.match(r"^[a-zA-Z][a-zA-Z0-9+.-]*:", target):
-        return False
-    return True
+    return URL_SCHEME_RE.match(target) is None
 
 
 def join_url_prefix(prefix: str, path_segments: list[str]) -> str:
     encoded_path = "/".join(quote(seg, safe="-_.~") for seg in path_segments if seg)
     clean = prefix.strip()
 
-    if re.match(r"^[a-zA-Z][a-zA-Z0-9+.-]*://", clean) or clean.startswith("//"):
+    if ABSOLUTE_URL_RE.match(clean) or clean.startswith("//"):
         base = clean.rstrip("/")
         return f"{base}/{encoded_path}" if encoded_path else base
 
@@ -524,13 +603,15 @@ def split_markdown_target(raw_target: str) -> tuple[str, str, bool]:
 
 
 def has_relative_image_links(content: str) -> bool:
-    for match in MARKDOWN_IMAGE_RE.finditer(content):
-        url, _, _ = split_markdown_target(match.group(2))
+    if "![" not in content and "<img" not in content.lower():
+        return False
+    for match in IMAGE_LINK_RE.finditer(content):
+        if match.group("md_head") is not None:
+            url, _, _ = split_markdown_target(match.group("md_target"))
+        else:
+            url = match.group("src")
         if url and is_relative_url(url):
             return True
-    for match in HTML_IMG_SRC_RE.finditer(content):
-        if is_relative_url(match.group(3)):
-            return True
     return False
 
 
@@ -544,40 +625,42 @@ def rewrite_image_links(
         return content, 0
     if not asset_dir_name:
         return content, 0
+    if "![" not in content and "<img" not in content.lower():
+        return content, 0
 
     changed = 0
 
-    def replace_markdown(match: re.Match[str]) -> str:
+    def replace_image(match: re.Match[str]) -> str:
         nonlocal changed
-        url, tail, wrapped = split_markdown_target(match.group(2))
-        if not url:
-            return match.group(0)
+        md_head = match.group("md_head")
+        if md_head is not None:
+            url, tail, wrapped = split_markdown_target(match.group("md_target"))
+            if not url:
+                return match.group(0)
+        else:
+            url = match.group("src")
         rewritten = rewrite_relative_asset_url(url, asset_dir_name, asset_url_prefix)
         if rewritten is None:
             return match.group(0)
         changed += 1
-        target = f"<{rewritten}>{tail}" if wrapped else f"{rewritten}{tail}"
-        return f"{match.group(1)}{target}{match.group(3)}"
-
-    def replace_html(match: re.Match[str]) -> str:
-        nonlocal changed
-        rewritten = rewrite_relative_asset_url(
-            match.group(3), asset_dir_name, asset_url_prefix
-        )
-        if rewritten is None:
-            return match.group(0)
-        changed += 1
-        return f"{match.group(1)}{match.group(2)}{rewritten}{match.group(4)}"
+        if md_head is not None:
+            target = f"<{rewritten}>{tail}" if wrapped else f"{rewritten}{tail}"
+            return f"{md_head}{target})"
+        quote = match.group("quote")
+        return f"{match.group('html_head')}{quote}{rewritten}{quote}"
 
-    content = MARKDOWN_IMAGE_RE.sub(replace_markdown, content)
-    content = HTML_IMG_SRC_RE.sub(replace_html, content)
-    return content, changed
+    return IMAGE_LINK_RE.sub(replace_image, content), changed
 
 
 def make_token(index: int) -> str:
     return f"{TOKEN_PREFIX}{index}@@"
 
 
+@functools.lru_cache(maxsize=16)
+def fence_close_re(fence_char: str, fence_len: int) -> re.Pattern[str]:
+    return re.compile(rf"^[ \t]*{re.escape(fence_char)}{{{fence_len},}}[ \t]*\r?\n?$")
+
+
 def mask_fenced_code_blocks(
     text: str, start_index: int
 ) -> tuple[str, dict[str, str], int]:
@@ -587,27 +670,23 @@ def mask_fenced_code_blocks(
     token_index = start_index
 
     in_fence = False
-    fence_char = ""
-    fence_len = 0
+    close_re: re.Pattern[str] | None = None
     fence_buffer: list[str] = []
 
     for line in lines:
         if not in_fence:
-            open_match = re.match(r"^[ \t]*(`{3,}|~{3,})", line)
+            open_match = FENCE_OPEN_RE.match(line)
             if open_match:
                 in_fence = True
-                fence_char = open_match.group(1)[0]
-                fence_len = len(open_match.group(1))
+                fence = open_match.group(1)
+                close_re = fence_close_re(fence[0], len(fence))
                 fence_buffer = [line]
                 continue
             out.append(line)
             continue
 
         fence_buffer.append(line)
-        close_match = re.match(
-            rf"^[ \t]*{re.escape(fence_char)}{{{fence_len},}}[ \t]*\r?\n?$", line
-        )
-        if close_match:
+        if close_re is not None and close_re.match(line):
             token = make_token(token_index)
             token_index += 1
             tokens[token] = "".join(fence_buffer)
@@ -628,74 +707,44 @@ def mask_inline_code_spans(
     tokens: dict[str, str] = {}
     token_index = start_index
 
-    i = 0
-    while i < len(text):
-        if text[i] != "`":
-            out.append(text[i])
-            i += 1
-            continue
-
-        j = i
-        while j < len(text) and text[j] == "`":
-            j += 1
-        ticks = j - i
-        delimiter = "`" * ticks
-        close_index = text.find(delimiter, j)
-        if close_index == -1:
-            out.append(text[i])
-            i += 1
-            continue
-
+    pos = 0
+    for match in INLINE_CODE_RE.finditer(text):
         token = make_token(token_index)
         token_index += 1
-        tokens[token] = text[i : close_index + ticks]
+        tokens[token] = match.group(0)
+        out.append(text[pos : match.start()])
         out.append(token)
-        i = close_index + ticks
+        pos = match.end()
+    out.append(text[pos:])
 
     return "".join(out), tokens, token_index
 
 
 def restore_tokens(text: str, tokens: dict[str, str]) -> str:
-    restored = text
-    for token, raw in tokens.items():
-        restored = restored.replace(token, raw)
-    return restored
+    # Each token is expanded at most once, so masked text that nests other
+    # tokens (e.g. a fence inside an inline span) is restored in one pass.
+    pending = dict(tokens)
 
-def is_escaped_at(text: str, index: int) -> bool:
-    backslashes = 0
-    pos = index - 1
-    while pos >= 0 and text[pos] == "\\":
-        backslashes += 1
-        pos -= 1
-    return (backslashes % 2) == 1
+    def repl(match: re.Match[str]) -> str:
+        raw = pending.pop(match.group(0), None)
+        if raw is None:
+            return match.group(0)
+        if TOKEN_PREFIX in raw:
+            return TOKEN_RE.sub(repl, raw)
+        return raw
 
+    return TOKEN_RE.sub(repl, text)
 
 def escape_math_underscores(text: str) -> str:
-    out: list[str] = []
-    for idx, ch in enumerate(text):
-        if ch == "_" and not is_escaped_at(text, idx):
-            out.append("\\_")
-        else:
-            out.append(ch)
-    return "".join(out)
+    if "\\_" not in text:
+        return text.replace("_", "\\_")
+    return MATH_UNDERSCORE_RE.sub(lambda m: m.group(1) + "\\_", text)
 
 
 def unescape_math_underscores(text: str) -> str:
-    out: list[str] = []
-    i = 0
-    while i < len(text):
-        if (
-            text[i] == "\\"
-            and i + 1 < len(text)
-            and text[i + 1] == "_"
-            and not is_escaped_at(text, i)
-        ):
-            out.append("_")
-            i += 2
-            continue
-        out.append(text[i])
-        i += 1
-    return "".join(out)
+    if "\\_" not in text:
+        return text
+    return MATH_ESCAPED_UNDERSCORE_RE.sub(lambda m: m.group(1) + "_", text)
 
 
 def normalize_math_underscores_segment(text: str, mode: str) -> str:
@@ -709,45 +758,38 @@ def normalize_math_underscores_segment(text: str, mode: str) -> str:
 def normalize_mathjax_underscores(markdown: str, mode: str) -> str:
     if mode == "keep" or not markdown:
         return markdown
+    if "$" not in markdown and "\\[" not in markdown and "\\(" not in markdown:
+        return markdown
 
     masked, fence_tokens, next_token = mask_fenced_code_blocks(markdown, 0)
     masked, inline_code_tokens, next_token = mask_inline_code_spans(masked, next_token)
-    code_tokens = dict(fence_tokens)
-    code_tokens.update(inline_code_tokens)
-
-    math_tokens: dict[str, str] = {}
+    tokens = dict(fence_tokens)
+    tokens.update(inline_code_tokens)
 
-    def protect_math(pattern: re.Pattern[str], prefix: str, suffix: str) -> None:
-        nonlocal masked, next_token
+    def protect_math(match: re.Match[str]) -> str:
+        nonlocal next_token
+        token = make_token(next_token)
+        next_token += 1
+        kind = match.lastgroup
+        prefix, suffix = MATH_BLOCK_DELIMITERS[kind]
+        inner = normalize_math_underscores_segment(match.group(kind), mode)
+        tokens[token] = f"{prefix}{inner}{suffix}"
+        return token
 
-        def repl(match: re.Match[str]) -> str:
-            nonlocal next_token
-            token = make_token(next_token)
-            next_token += 1
-            inner = normalize_math_underscores_segment(match.group(1), mode)
-            math_tokens[token] = f"{prefix}{inner}{suffix}"
-            return token
-
-        masked = pattern.sub(repl, masked)
-
-    protect_math(DISPLAY_DOLLAR_RE, "$$", "$$")
-    protect_math(BRACKET_MATH_RE, r"\[", r"\]")
-    protect_math(PAREN_MATH_RE, r"\(", r"\)")
+    masked = MATH_BLOCK_RE.sub(protect_math, masked)
 
     masked = INLINE_DOLLAR_RE.sub(
         lambda m: f"${normalize_math_underscores_segment(m.group(1), mode)}$",
         masked,
     )
 
-    masked = restore_tokens(masked, math_tokens)
-    masked = restore_tokens(masked, code_tokens)
-    return masked
+    return restore_tokens(masked, tokens)
 
 
 def read_post(
     path: Path,
     source_dir: Path,
-    asset_dir_names: set[str],
+    asset_index: AssetDirIndex,
     default_author: str,
     asset_mode: str,
     asset_url_prefix: str,
@@ -769,7 +811,7 @@ def read_post(
     categories = normalize_list(meta.get("categories"))
     tags = normalize_list(meta.get("tags"))
 
-    asset_dir_name = resolve_asset_dir_name(path, source_dir, asset_dir_names)
+    asset_dir_name = resolve_asset_dir_name(path, source_dir, asset_index)
 
     normalized_content = normalize_mathjax_underscores(content.strip(), math_underscore_mode)
     rewritten_content, rewritten_count = rewrite_image_links(
@@ -780,7 +822,11 @@ def read_post(
     )
 
     warning: str | None = None
-    if asset_mode == "prefix" and has_relative_image_links(normalized_content) and not asset_dir_name:
+    if (
+        asset_mode == "prefix"
+        and not asset_dir_name
+        and has_relative_image_links(normalized_content)
+    ):
         warning = f"{path.name} has relative images but no matched asset folder."
 
     post = HexoPost(
@@ -802,6 +848,87 @@ def read_post(
     return post, warning
 
 
+def scan_source_dir(source_dir: Path) -> tuple[list[Path], set[str]]:
+    # One scandir walk finds the markdown files and the top-level (asset)
+    # directories; like Path.rglob, symlinked directories are not entered.
+    root = os.fspath(source_dir)
+    markdown_paths: list[str] = []
+    asset_dir_names: set[str] = set()
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except PermissionError:
+            # Path.rglob skips unreadable directories the same way.
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if current == root:
+                        asset_dir_names.add(entry.name)
+                    if not entry.is_symlink():
+                        stack.append(entry.path)
+                elif (
+                    os.path.splitext(entry.name)[1].lower() in MARKDOWN_SUFFIXES
+                    and entry.is_file()
+                ):
+                    markdown_paths.append(entry.path)
+    # Sorting plain strings by their components gives Path ordering without
+    # building and comparing Path objects.
+    markdown_paths.sort(key=lambda p: os.path.normcase(p).split(os.sep))
+    return [Path(p) for p in markdown_paths], asset_dir_names
+
+
+PostResult = tuple[HexoPost, str | None]
+
+
+def parse_posts(
+    reader: Callable[[Path], PostResult], paths: list[Path], jobs: int
+) -> list[PostResult]:
+    workers = min(jobs, len(paths))
+    if workers > 1:
+        chunksize = max(1, len(paths) // (4 * workers))
+        started = False
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # map submits every chunk up front, which is when the workers
+                # are spawned; later errors come from read_post and propagate.
+                results = pool.map(reader, paths, chunksize=chunksize)
+                started = True
+                return list(results)
+        except BrokenProcessPool:
+            # A worker died abruptly; parse serially instead.
+            pass
+        except (OSError, NotImplementedError):
+            if started:
+                raise
+            # No usable process pool here (e.g. no sem_open); parse serially.
+    return [reader(path) for path in paths]
+
+
+def load_post_cache(cache_path: Path) -> dict[bytes, PostResult]:
+    try:
+        with cache_path.open("rb") as f:
+            cache = pickle.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as exc:
+        print(f"Ignoring unreadable post cache {cache_path}: {exc}", file=sys.stderr)
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_post_cache(cache_path: Path, cache: dict[bytes, PostResult]) -> None:
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as exc:
+        print(f"Failed to write post cache {cache_path}: {exc}", file=sys.stderr)
+
+
 def collect_posts(
     source_dir: Path,
     default_author: str,
@@ -809,26 +936,56 @@ def collect_posts(
     asset_mode: str,
     asset_url_prefix: str,
     math_underscore_mode: str,
+    jobs: int = 1,
+    cache_path: Path | None = None,
 ) -> tuple[list[HexoPost], list[str]]:
     posts: list[HexoPost] = []
     warnings: list[str] = []
-    asset_dir_names = {d.name for d in source_dir.iterdir() if d.is_dir()}
+    markdown_paths, asset_dir_names = scan_source_dir(source_dir)
+    asset_index = build_asset_dir_index(asset_dir_names)
 
-    for path in sorted(source_dir.rglob("*")):
-        if not path.is_file():
-            continue
-        if path.suffix.lower() not in {".md", ".markdown"}:
-            continue
+    reader = functools.partial(
+        read_post,
+        source_dir=source_dir,
+        asset_index=asset_index,
+        default_author=default_author,
+        asset_mode=asset_mode,
+        asset_url_prefix=asset_url_prefix,
+        math_underscore_mode=math_underscore_mode,
+    )
 
-        post, warning = read_post(
-            path=path,
-            source_dir=source_dir,
-            asset_dir_names=asset_dir_names,
-            default_author=default_author,
-            asset_mode=asset_mode,
-            asset_url_prefix=asset_url_prefix,
-            math_underscore_mode=math_underscore_mode,
-        )
+    if cache_path is None:
+        results = parse_posts(reader, markdown_paths, jobs)
+    else:
+        # A cached result is only valid for the same bytes at the same path
+        # with the same settings and asset folders, so all of them go into
+        # the key.
+        config = repr(
+            (
+                CACHE_VERSION,
+                str(source_dir),
+                default_author,
+                asset_mode,
+                asset_url_prefix,
+                math_underscore_mode,
+                sorted(asset_dir_names),
+            )
+        ).encode("utf-8")
+        keys: list[bytes] = []
+        for path in markdown_paths:
+            digest = hashlib.sha1(config)
+            digest.update(os.fsencode(path))
+            digest.update(b"\0")
+            digest.update(path.read_bytes())
+            keys.append(digest.digest())
+
+        cache = load_post_cache(cache_path)
+        missing = [path for path, key in zip(markdown_paths, keys) if key not in cache]
+        parsed = iter(parse_posts(reader, missing, jobs))
+        results = [cache[key] if key in cache else next(parsed) for key in keys]
+        save_post_cache(cache_path, dict(zip(keys, results)))
+
+    for post, warning in results:
         if post.status != "publish" and not include_drafts:
             continue
         posts.append(post)
@@ -842,6 +999,8 @@ def collect_posts(
 def sql_quote(value: str | None) -> str:
     if value is None:
         return "NULL"
+    # Chained replace beats str.translate here: post bodies are large, and
+    # translate with multi-character replacements walks them per code point.
     escaped = (
         value.replace("\\", "\\\\")
         .replace("\0", "\\0")
@@ -879,158 +1038,177 @@ def compose_text(content: str, excerpt: str) -> str:
         return merged
     return markdown_marker + merged
 
-def build_sql(
+def content_row(cid: int, post: HexoPost, author_value: str) -> str:
+    values = ",".join(
+        (
+            str(cid),
+            sql_quote(post.title),
+            sql_quote(post.slug),
+            str(to_unix_timestamp(post.date)),
+            str(to_unix_timestamp(post.updated)),
+            sql_quote(compose_text(post.content, post.excerpt)),
+            "0",
+            author_value,
+            "NULL",
+            "'page'" if post.post_type == "page" else "'post'",
+            sql_quote(post.status if post.status in VALID_STATUSES else "publish"),
+            "NULL",
+            "0",
+            "'1'",
+            "'1'",
+            "'1'",
+            "0",
+        )
+    )
+    return f"({values})"
+
+
+def meta_row(term: Term) -> str:
+    values = ",".join(
+        (
+            str(term.mid),
+            sql_quote(term.name),
+            sql_quote(term.slug),
+            sql_quote(term.term_type),
+            "''",
+            str(term.count),
+            "0",
+            "0",
+        )
+    )
+    return f"({values})"
+
+
+def iter_insert_batches(head: str, rows: Iterable[str], batch_size: int) -> Iterator[str]:
+    batch: list[str] = []
+    batch_chars = 0
+    for row in rows:
+        if batch and (
+            len(batch) >= batch_size or batch_chars + len(row) > MAX_INSERT_CHARS
+        ):
+            yield head + ",\n".join(batch) + ";"
+            batch = []
+            batch_chars = 0
+        batch.append(row)
+        batch_chars += len(row) + 2
+    if batch:
+        yield head + ",\n".join(batch) + ";"
+
+
+def iter_sql(
     posts: list[HexoPost],
     prefix: str,
     author_id: int,
     cid_start: int,
     mid_start: int,
     truncate: bool,
-) -> str:
+    batch_size: int = 500,
+) -> Iterator[str]:
     prefix = normalize_prefix(prefix)
 
-    post_rows: list[dict[str, Any]] = []
     term_map: dict[tuple[str, str], Term] = {}
     relationships: list[tuple[int, int]] = []
     relation_seen: set[tuple[int, int]] = set()
 
-    next_cid = max(cid_start, 1)
+    first_cid = max(cid_start, 1)
     next_mid = max(mid_start, 1)
 
-    for post in posts:
-        cid = next_cid
-        next_cid += 1
-
-        post_rows.append(
-            {
-                "cid": cid,
-                "title": post.title,
-                "slug": post.slug,
-                "created": to_unix_timestamp(post.date),
-                "modified": to_unix_timestamp(post.updated),
-                "text": compose_text(post.content, post.excerpt),
-                "authorId": max(author_id, 1),
-                "type": "page" if post.post_type == "page" else "post",
-                "status": post.status
-                if post.status in {"publish", "draft", "private", "hidden", "waiting"}
-                else "publish",
-            }
-        )
-
-        for name in dedupe(post.categories):
-            key = ("category", name)
-            if key not in term_map:
-                term_map[key] = Term(
-                    mid=next_mid,
-                    name=name,
-                    slug=slugify(name),
-                    term_type="category",
-                    count=0,
-                )
-                next_mid += 1
-
-            term_map[key].count += 1
-            relation = (cid, term_map[key].mid)
-            if relation not in relation_seen:
-                relation_seen.add(relation)
-                relationships.append(relation)
-
-        for name in dedupe(post.tags):
-            key = ("tag", name)
-            if key not in term_map:
-                term_map[key] = Term(
-                    mid=next_mid,
-                    name=name,
-                    slug=slugify(name),
-                    term_type="tag",
-                    count=0,
-                )
-                next_mid += 1
-
-            term_map[key].count += 1
-            relation = (cid, term_map[key].mid)
-            if relation not in relation_seen:
-                relation_seen.add(relation)
-                relationships.append(relation)
+    for offset, post in enumerate(posts):
+        cid = first_cid + offset
+        for term_type, names in (("category", post.categories), ("tag", post.tags)):
+            for name in dedupe(names):
+                key = (term_type, name)
+                if key not in term_map:
+                    term_map[key] = Term(
+                        mid=next_mid,
+                        name=name,
+                        slug=slugify(name),
+                        term_type=term_type,
+                        count=0,
+                    )
+                    next_mid += 1
+
+                term_map[key].count += 1
+                relation = (cid, term_map[key].mid)
+                if relation not in relation_seen:
+                    relation_seen.add(relation)
+                    relationships.append(relation)
 
     terms = sorted(term_map.values(), key=lambda t: t.mid)
+    author_value = str(max(author_id, 1))
 
-    lines: list[str] = [
-        "-- Generated by hexo2typecho.py",
-        "-- Import target: Typecho (MySQL/MariaDB)",
-        "SET NAMES utf8mb4;",
-        "START TRANSACTION;",
-    ]
+    yield "-- Generated by hexo2typecho.py"
+    yield "-- Import target: Typecho (MySQL/MariaDB)"
+    yield "SET NAMES utf8mb4;"
+    yield "START TRANSACTION;"
 
     if truncate:
-        lines.extend(
-            [
-                f"DELETE FROM `{prefix}relationships`;",
-                f"DELETE FROM `{prefix}metas`;",
-                f"DELETE FROM `{prefix}contents`;",
-            ]
-        )
-
-    lines.append("")
-    lines.append("-- Contents")
-    for row in post_rows:
-        lines.append(
-            (
-                f"INSERT INTO `{prefix}contents` "
-                "(`cid`,`title`,`slug`,`created`,`modified`,`text`,`order`,`authorId`,`template`,`type`,`status`,`password`,`commentsNum`,`allowComment`,`allowPing`,`allowFeed`,`parent`) "
-                "VALUES "
-                f"({row['cid']},{sql_quote(row['title'])},{sql_quote(row['slug'])},{row['created']},{row['modified']},{sql_quote(row['text'])},0,{row['authorId']},NULL,{sql_quote(row['type'])},{sql_quote(row['status'])},NULL,0,'1','1','1',0);"
-            )
-        )
-
-    lines.append("")
-    lines.append("-- Metas (categories/tags)")
-    for term in terms:
-        lines.append(
-            (
-                f"INSERT INTO `{prefix}metas` "
-                "(`mid`,`name`,`slug`,`type`,`description`,`count`,`order`,`parent`) "
-                "VALUES "
-                f"({term.mid},{sql_quote(term.name)},{sql_quote(term.slug)},{sql_quote(term.term_type)},'',{term.count},0,0);"
-            )
-        )
+        yield f"DELETE FROM `{prefix}relationships`;"
+        yield f"DELETE FROM `{prefix}metas`;"
+        yield f"DELETE FROM `{prefix}contents`;"
+
+    yield ""
+    yield "-- Contents"
+    yield from iter_insert_batches(
+        f"INSERT INTO `{prefix}contents` {CONTENT_COLUMNS} VALUES ",
+        (
+            content_row(first_cid + offset, post, author_value)
+            for offset, post in enumerate(posts)
+        ),
+        batch_size,
+    )
 
-    lines.append("")
-    lines.append("-- Relationships")
-    for cid, mid in relationships:
-        lines.append(
-            f"INSERT INTO `{prefix}relationships` (`cid`,`mid`) VALUES ({cid},{mid});"
-        )
+    yield ""
+    yield "-- Metas (categories/tags)"
+    yield from iter_insert_batches(
+        f"INSERT INTO `{prefix}metas` {META_COLUMNS} VALUES ",
+        (meta_row(term) for term in terms),
+        batch_size,
+    )
 
-    next_contents_ai = max((row["cid"] for row in post_rows), default=cid_start - 1) + 1
-    next_metas_ai = max((term.mid for term in terms), default=mid_start - 1) + 1
+    yield ""
+    yield "-- Relationships"
+    yield from iter_insert_batches(
+        f"INSERT INTO `{prefix}relationships` (`cid`,`mid`) VALUES ",
+        (f"({cid},{mid})" for cid, mid in relationships),
+        batch_size,
+    )
 
-    lines.extend(
-        [
-            "",
-            f"ALTER TABLE `{prefix}contents` AUTO_INCREMENT = {max(next_contents_ai, 1)};",
-            f"ALTER TABLE `{prefix}metas` AUTO_INCREMENT = {max(next_metas_ai, 1)};",
-            "COMMIT;",
-            "",
-        ]
+    # Ids are handed out sequentially from values clamped to >= 1, so the
+    # next free ids are simply the counters' final positions.
+    yield (
+        f"\nALTER TABLE `{prefix}contents` AUTO_INCREMENT = {first_cid + len(posts)};"
+        f"\nALTER TABLE `{prefix}metas` AUTO_INCREMENT = {next_mid};"
+        "\nCOMMIT;"
     )
 
-    return "\n".join(lines)
+
+def find_posts_dir(source_dir: Path) -> Path:
+    # One listing answers both questions: is there a "_posts" directory, and
+    # are there markdown files at the top level (then the root is used as is).
+    has_posts_dir = False
+    try:
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith((".md", ".markdown")):
+                    return source_dir
+                if entry.name == "_posts" and entry.is_dir():
+                    has_posts_dir = True
+    except OSError:
+        return source_dir
+    if not has_posts_dir:
+        return source_dir
+    return Path(os.path.realpath(os.path.join(source_dir, "_posts")))
 
 
 def main() -> int:
     args = parse_args()
-    source_dir = Path(args.source).expanduser().resolve()
-    output_path = Path(args.output).expanduser().resolve()
+    source_dir = Path(os.path.realpath(os.path.expanduser(args.source)))
+    output_path = Path(os.path.realpath(os.path.expanduser(args.output)))
 
     # If user points to Hexo "source" root, auto-target "_posts".
-    posts_candidate = source_dir / "_posts"
-    if source_dir.name.lower() != "_posts" and posts_candidate.is_dir():
-        has_top_level_md = any(source_dir.glob("*.md")) or any(
-            source_dir.glob("*.markdown")
-        )
-        if not has_top_level_md:
-            source_dir = posts_candidate.resolve()
+    if source_dir.name.lower() != "_posts":
+        source_dir = find_posts_dir(source_dir)
 
     if not source_dir.exists():
         print(f"Source directory does not exist: {source_dir}", file=sys.stderr)
@@ -1040,6 +1218,14 @@ def main() -> int:
         print("--author-id must be >= 1", file=sys.stderr)
         return 1
 
+    if args.jobs < 1:
+        print("--jobs must be >= 1", file=sys.stderr)
+        return 1
+
+    if args.batch_size < 1:
+        print("--batch-size must be >= 1", file=sys.stderr)
+        return 1
+
     posts, warnings = collect_posts(
         source_dir=source_dir,
         default_author=args.author,
@@ -1047,37 +1233,52 @@ def main() -> int:
         asset_mode=args.asset_mode,
         asset_url_prefix=args.asset_url_prefix,
         math_underscore_mode=args.math_underscore_mode,
+        jobs=args.jobs,
+        cache_path=(
+            Path(os.path.realpath(os.path.expanduser(args.cache))) if args.cache else None
+        ),
     )
 
-    sql_text = build_sql(
+    sql_lines = iter_sql(
         posts=posts,
         prefix=args.table_prefix,
         author_id=args.author_id,
         cid_start=args.cid_start,
         mid_start=args.mid_start,
         truncate=args.truncate,
+        batch_size=args.batch_size,
     )
 
-    output_path.write_text(sql_text, encoding=args.encoding, newline="\n")
+    # An incremental encoder writes a BOM (utf-16, utf-8-sig) only once,
+    # unlike encoding each line separately.
+    encode = codecs.getincrementalencoder(args.encoding)().encode
+    with output_path.open("wb", buffering=OUTPUT_BUFFER_SIZE) as f:
+        for line in sql_lines:
+            f.write(encode(f"{line}\n"))
 
-    matched_asset_dirs = sum(1 for post in posts if post.asset_dir_name)
-    rewritten_links = sum(post.rewritten_image_links for post in posts)
+    post_count = len(posts)
+    matched_asset_dirs = 0
+    rewritten_links = 0
+    for post in posts:
+        if post.asset_dir_name:
+            matched_asset_dirs += 1
+        rewritten_links += post.rewritten_image_links
 
-    print(f"Converted {len(posts)} posts.")
+    print(f"Converted {post_count} posts.")
     print(f"Output SQL: {output_path}")
-    print(f"Matched asset folders: {matched_asset_dirs}/{len(posts)}")
+    print(f"Matched asset folders: {matched_asset_dirs}/{post_count}")
     if args.asset_mode == "prefix":
         print(f"Rewritten image links: {rewritten_links}")
 
-    if warnings:
-        print(
-            f"Warning: {len(warnings)} posts have relative image links but no matched asset folder.",
-            file=sys.stderr,
-        )
-        for warning in warnings[:20]:
-            print(f"  - {warning}", file=sys.stderr)
-        if len(warnings) > 20:
-            print(f"  ... and {len(warnings) - 20} more", file=sys.stderr)
+    warning_count = len(warnings)
+    if warning_count:
+        message = [
+            f"Warning: {warning_count} posts have relative image links but no matched asset folder."
+        ]
+        message.extend(f"  - {warning}" for warning in warnings[:20])
+        if warning_count > 20:
+            message.append(f"  ... and {warning_count - 20} more")
+        sys.stderr.write("\n".join(message) + "\n")
 
     if not posts:
         print("Warning: no posts found. Check --source path.")